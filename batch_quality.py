@@ -0,0 +1,33 @@
+import argparse
+from core.metrics import StegoMetrics
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch image quality evaluation (MSE, PSNR, wPSNR, SSIM).")
+    parser.add_argument("--cover-dir", help="Folder with the original images")
+    parser.add_argument("--stego-dir", help="Folder with the stego images (matched by file name)")
+    parser.add_argument("--manifest", help="CSV (cover,stego) or JSONL manifest of image pairs")
+    parser.add_argument("-o", "--output", default="quality_report.jsonl", help="Results file (.jsonl or .csv)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Pairs queued at once (default: 2 per worker)")
+    parser.add_argument("--band-rows", type=int, default=None, help="Use tiled metrics with this band height")
+    args = parser.parse_args()
+
+    if args.manifest:
+        pairs = StegoMetrics.read_manifest(args.manifest)
+    elif args.cover_dir and args.stego_dir:
+        pairs = StegoMetrics.pair_directories(args.cover_dir, args.stego_dir)
+    else:
+        parser.error("Give either --manifest or both --cover-dir and --stego-dir")
+
+    done = failed = 0
+    for result in StegoMetrics.evaluate_batch(pairs, args.output, args.workers, args.max_in_flight, args.band_rows):
+        done += 1
+        if "error" in result:
+            failed += 1
+            print(f"    [!] {result['stego']}: {result['error']}")
+        if done % 1000 == 0: print(f"    > {done}/{len(pairs)} pairs evaluated")
+
+    print(f"[+] Evaluated {done} pairs ({failed} failed). Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
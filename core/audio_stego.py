@@ -1,84 +1,148 @@
 import wave
 import os
+import numpy as np
+from core.framing import PayloadFramer
 
 class AudioStego:
-    
-    def embed_audio(self, audio_path, message, output_path):
+    def __init__(self):
+        self.delimiter = "$$$"
+        # The legacy layout skipped 44 bytes of sample data (readframes() has
+        # already stripped the real header) and wrote one bit per byte.
+        self.legacy_skip = 44
+        # Streaming mode: frames per read/modify/write step, and per bulk copy
+        self.chunk_frames = 1 << 16
+        self.copy_chunk_frames = 1 << 20
+
+    def sample_lsb_view(self, frame_bytes, sample_width):
+        """
+        Zero-copy view of the least-significant byte of every sample.
+        WAV samples are little-endian, so for 8/16/24/32-bit audio the LSB
+        lives in the first byte of each sample (numpy has no int24 dtype).
+        Writable if frame_bytes is a bytearray.
+        """
+        data = np.frombuffer(frame_bytes, dtype=np.uint8)
+        return data.reshape(-1, sample_width)[:, 0]
+
+    def embed_audio(self, audio_path, message, output_path, legacy=False, streaming=False):
         """
-        Hides a message into a .wav file using LSB Steganography.
-        FIX: Skips the 44-byte WAV header.
+        Hides a message (str or bytes) into a .wav file using LSB Steganography.
+        One payload bit goes into the LSB of each sample, as a length-prefixed
+        frame; legacy=True writes the old "$$$"-terminated, bit-per-byte layout.
+        streaming=True processes the file in chunks (see embed_audio_streaming).
         """
         if not os.path.exists(audio_path): raise ValueError("Audio file not found.")
-        
-        song = wave.open(audio_path, mode='rb')
-        n_frames = song.getnframes()
-        frames = song.readframes(n_frames)
-        frame_bytes = bytearray(frames)
-        
-        # --- FIX 1: Define Header Size ---
-        HEADER_SIZE = 44 
-        
-        message += "$$$" # Delimiter
-        binary_msg = ''.join([format(ord(i), "08b") for i in message])
-        
-        print(f"[*] Embedding {len(binary_msg)} bits...")
-        
-        if len(binary_msg) > len(frame_bytes) - HEADER_SIZE:
-            raise ValueError("Message too large for this audio file (after skipping header)!")
-            
-        # Embed bits into the LSB of audio bytes
-        for i in range(len(binary_msg)):
-            # --- FIX 2: Start embedding after the header ---
-            byte_index = i + HEADER_SIZE
-            
-            # Clear last bit (AND 254) then set new bit (OR bit)
-            frame_bytes[byte_index] = (frame_bytes[byte_index] & 254) | int(binary_msg[i])
-            
-        frame_modified = bytes(frame_bytes)
-        
+        if streaming:
+            if legacy: raise ValueError("Streaming mode only writes framed payloads.")
+            return self.embed_audio_streaming(audio_path, message, output_path)
+
+        with wave.open(audio_path, mode='rb') as song:
+            params = song.getparams()
+            frame_bytes = bytearray(song.readframes(params.nframes))
+
+        if legacy:
+            message += self.delimiter
+            binary_msg = ''.join([format(ord(i), "08b") for i in message])
+            bits = np.frombuffer(binary_msg.encode(), dtype=np.uint8) - ord('0')
+            carrier = np.frombuffer(frame_bytes, dtype=np.uint8)[self.legacy_skip:]
+        else:
+            bits = np.unpackbits(np.frombuffer(PayloadFramer.pack(message), dtype=np.uint8))
+            carrier = self.sample_lsb_view(frame_bytes, params.sampwidth)
+
+        print(f"[*] Embedding {len(bits)} bits...")
+
+        if len(bits) > len(carrier):
+            raise ValueError("Message too large for this audio file!")
+
+        # Clear last bit (AND 254) then set new bit (OR bit), all samples at once
+        carrier[:len(bits)] = (carrier[:len(bits)] & 254) | bits
+
         # Write Output
         with wave.open(output_path, 'wb') as fd:
-            fd.setparams(song.getparams())
-            fd.writeframes(frame_modified)
-            
-        song.close()
-        return len(binary_msg)
+            fd.setparams(params)
+            fd.writeframes(frame_bytes)
+
+        return len(bits)
 
-    def extract_audio(self, audio_path):
+    def embed_audio_streaming(self, audio_path, message, output_path):
+        """
+        Constant-memory variant of embed_audio for multi-gigabyte WAVs.
+        Only the leading chunks that carry payload bits are unpacked and
+        modified (chunk_frames at a time); the rest of the file is copied
+        through untouched in copy_chunk_frames blocks.
+        """
+        if not os.path.exists(audio_path): raise ValueError("Audio file not found.")
+
+        bits = np.unpackbits(np.frombuffer(PayloadFramer.pack(message), dtype=np.uint8))
+        print(f"[*] Streaming {len(bits)} bits into audio...")
+
+        with wave.open(audio_path, mode='rb') as song:
+            params = song.getparams()
+            if len(bits) > params.nframes * params.nchannels:
+                raise ValueError("Message too large for this audio file!")
+
+            with wave.open(output_path, 'wb') as fd:
+                fd.setparams(params)
+
+                # 1. Payload-carrying chunks: read, set sample LSBs, write
+                bit_idx = 0
+                while bit_idx < len(bits):
+                    chunk = bytearray(song.readframes(self.chunk_frames))
+                    # The header's nframes is not trusted: a truncated file runs dry early
+                    if not chunk: raise ValueError("Message too large for this audio file (audio data ends early)!")
+                    carrier = self.sample_lsb_view(chunk, params.sampwidth)
+                    n = min(len(carrier), len(bits) - bit_idx)
+                    carrier[:n] = (carrier[:n] & 254) | bits[bit_idx:bit_idx + n]
+                    fd.writeframesraw(chunk)
+                    bit_idx += n
+
+                # 2. Untouched remainder: bulk copy
+                while True:
+                    data = song.readframes(self.copy_chunk_frames)
+                    if not data: break
+                    fd.writeframesraw(data)
+
+        return len(bits)
+
+    def extract_audio(self, audio_path, legacy=False):
         """
         Extracts hidden LSB message from .wav file.
-        FIX: Starts extraction after the 44-byte WAV header.
+        Reads the frame header and then only the payload's bits; files
+        without a header fall back to the delimiter scan.
+        legacy=True scans for the old "$$$" delimiter directly.
         """
         if not os.path.exists(audio_path): raise ValueError("Audio file not found.")
-        
-        song = wave.open(audio_path, mode='rb')
-        n_frames = song.getnframes()
-        frames = song.readframes(n_frames)
-        frame_bytes = bytearray(frames)
-        
-        HEADER_SIZE = 44
-        
-        extracted_bits = ""
-        delimiter = "$$$"
-        delimiter_bin = ''.join([format(ord(i), "08b") for i in delimiter])
-        
+
+        if not legacy:
+            with wave.open(audio_path, mode='rb') as song:
+                # Seek to just the frames that hold the requested bits, so
+                # long files are never loaded whole
+                sample_width, n_channels = song.getsampwidth(), song.getnchannels()
+                n_samples = song.getnframes() * n_channels
+                n_samples -= n_samples % 8  # Whole bytes only
+                def read_bytes(offset, count):
+                    first = offset * 8
+                    last = min((offset + count) * 8, n_samples)
+                    if last <= first: return b""
+                    song.setpos(first // n_channels)
+                    frames = song.readframes((last - 1) // n_channels - first // n_channels + 1)
+                    lsb = self.sample_lsb_view(frames, sample_width)
+                    skip = first % n_channels
+                    return np.packbits(lsb[skip:skip + last - first] & 1).tobytes()
+
+                payload = PayloadFramer.read_frame(read_bytes)
+            if payload is not None: return payload
+            # No frame header: fall back to the "$$$" layout of older files
+
+        with wave.open(audio_path, mode='rb') as song:
+            frames = song.readframes(song.getnframes())
+
         print("[*] Scanning Audio Stream...")
-        
-        # Extract LSBs starting after header
-        # Iterate over only the possible message space (after 44)
-        for i in range(HEADER_SIZE, len(frame_bytes)):
-            extracted_bits += str(frame_bytes[i] & 1)
-            
-            # Check for delimiter only when full bytes are available
-            if (i - HEADER_SIZE) % 8 == 7 and len(extracted_bits) >= len(delimiter_bin):
-                if extracted_bits.endswith(delimiter_bin):
-                    # Convert bits to string
-                    raw_bits = extracted_bits[:-len(delimiter_bin)]
-                    chars = []
-                    for b in range(0, len(raw_bits), 8):
-                        byte = raw_bits[b:b+8]
-                        chars.append(chr(int(byte, 2)))
-                    return "".join(chars)
-                    
-        song.close()
-        return "No hidden message found."
\ No newline at end of file
+
+        # Extract LSBs starting after the skipped bytes and search for the delimiter
+        lsb = np.frombuffer(frames, dtype=np.uint8)[self.legacy_skip:] & 1
+        data = np.packbits(lsb[:len(lsb) - (len(lsb) % 8)]).tobytes()
+        pos = data.find(self.delimiter.encode('latin-1'))
+        if pos != -1:
+            return data[:pos].decode('latin-1')
+
+        return "No hidden message found."
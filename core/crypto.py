@@ -3,8 +3,18 @@ from Crypto.Util.Padding import pad, unpad
 from Crypto.Random import get_random_bytes
 import base64
 import hashlib
+import struct
 
 class CryptoHandler:
+    # Stream layout: MAGIC | VERSION | chunk size (4) | nonce prefix (8), then records of
+    # length word (4, top bit = final) | ciphertext | GCM tag (16).
+    # Each chunk's nonce is prefix + chunk counter, and the header and its
+    # length word are authenticated with it, so chunks cannot be reordered,
+    # resized, dropped or cut off at the end without failing verification.
+    STREAM_MAGIC = b"SWGC"
+    STREAM_VERSION = 1
+    FINAL_BIT = 0x80000000
+
     def __init__(self, key=None):
         # AES-256 requires a 32-byte key
         if key:
@@ -12,44 +22,130 @@ class CryptoHandler:
             self.key = hashlib.sha256(key.encode()).digest()
         else:
             self.key = get_random_bytes(32)
+        # Streaming mode: plaintext bytes per authenticated AES-GCM chunk
+        self.stream_chunk = 1 << 16
+
+    def encrypt_bytes(self, data):
+        """
+        Encrypts str or bytes using AES-CBC and returns raw IV + ciphertext.
+        The stego engines embed bytes directly, so this skips the 33% base64 overhead.
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
 
-    def encrypt(self, plain_text):
-        """Encrypts string using AES-CBC and returns a Base64 string."""
         # 1. Generate a random Initialization Vector (IV)
         iv = get_random_bytes(16)
         
         # 2. Initialize Cipher
         cipher = AES.new(self.key, AES.MODE_CBC, iv)
         
-        # 3. Pad the data to be a multiple of 16 bytes
-        padded_data = pad(plain_text.encode('utf-8'), AES.block_size)
-        
-        # 4. Encrypt
-        encrypted_bytes = cipher.encrypt(padded_data)
+        # 3. Pad the data to be a multiple of 16 bytes, then encrypt
+        encrypted_bytes = cipher.encrypt(pad(data, AES.block_size))
         
-        # 5. Combine IV + Encrypted Data (we need the IV to decrypt later)
-        combined_data = iv + encrypted_bytes
+        # 4. Combine IV + Encrypted Data (we need the IV to decrypt later)
+        return iv + encrypted_bytes
+
+    def decrypt_bytes(self, enc_data):
+        """
+        Decrypts raw IV + ciphertext from encrypt_bytes and returns the plaintext bytes.
+        Raises ValueError if the key is wrong or the data is corrupted.
+        """
+        enc_data = bytes(enc_data)
+        if len(enc_data) < 2 * AES.block_size or len(enc_data) % AES.block_size:
+            raise ValueError("Ciphertext has an invalid length")
+
+        # 1. Extract the IV (first 16 bytes) and the actual ciphertext
+        iv = enc_data[:16]
+        ciphertext = enc_data[16:]
         
-        # 6. Return as Base64 string so it fits into our LSB text hider
-        return base64.b64encode(combined_data).decode('utf-8')
+        # 2. Decrypt and Unpad
+        cipher = AES.new(self.key, AES.MODE_CBC, iv)
+        return unpad(cipher.decrypt(ciphertext), AES.block_size)
+
+    def encrypt(self, plain_text):
+        """Encrypts string using AES-CBC and returns a Base64 string."""
+        # Base64 so it fits into text-only carriers
+        return base64.b64encode(self.encrypt_bytes(plain_text)).decode('utf-8')
 
     def decrypt(self, enc_string):
         """Decrypts a Base64 AES-CBC string."""
         try:
-            # 1. Decode from Base64 back to bytes
-            enc_data = base64.b64decode(enc_string)
-            
-            # 2. Extract the IV (first 16 bytes) and the actual ciphertext
-            iv = enc_data[:16]
-            ciphertext = enc_data[16:]
-            
-            # 3. Initialize Cipher with the extracted IV
-            cipher = AES.new(self.key, AES.MODE_CBC, iv)
-            
-            # 4. Decrypt and Unpad
-            decrypted_padded = cipher.decrypt(ciphertext)
-            decrypted_data = unpad(decrypted_padded, AES.block_size)
-            
-            return decrypted_data.decode('utf-8')
+            return self.decrypt_bytes(base64.b64decode(enc_string)).decode('utf-8')
         except (ValueError, KeyError) as e:
-            return f"Decryption Error: {str(e)} (Key might be wrong or data corrupted)"
\ No newline at end of file
+            return f"Decryption Error: {str(e)} (Key might be wrong or data corrupted)"
+
+    # --- STREAMING (AUTHENTICATED, CONSTANT MEMORY) ---
+    def _chunk_cipher(self, prefix, counter, aad):
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=prefix + struct.pack(">I", counter), mac_len=16)
+        cipher.update(aad)
+        return cipher
+
+    @staticmethod
+    def _read_full(src, size):
+        """Reads until size bytes or EOF; pipes and sockets may return less per read()."""
+        data = src.read(size)
+        while data and len(data) < size:
+            more = src.read(size - len(data))
+            if not more: break
+            data += more
+        return data
+
+    def encrypt_stream(self, src, dst):
+        """
+        Encrypts file-like src into file-like dst with chunked AES-GCM,
+        stream_chunk bytes at a time. Returns the number of bytes written.
+        """
+        prefix = get_random_bytes(8)
+        header = self.STREAM_MAGIC + bytes([self.STREAM_VERSION]) + struct.pack(">I", self.stream_chunk) + prefix
+        dst.write(header)
+        written = len(header)
+
+        counter = 0
+        chunk = self._read_full(src, self.stream_chunk)
+        while True:
+            # Read one chunk ahead so the last record can be flagged final
+            next_chunk = self._read_full(src, self.stream_chunk) if len(chunk) == self.stream_chunk else b""
+            length_word = struct.pack(">I", len(chunk) | (0 if next_chunk else self.FINAL_BIT))
+            ciphertext, tag = self._chunk_cipher(prefix, counter, header + length_word).encrypt_and_digest(chunk)
+            dst.write(length_word + ciphertext + tag)
+            written += len(length_word) + len(ciphertext) + len(tag)
+
+            if not next_chunk: return written
+            chunk = next_chunk
+            counter += 1
+
+    def decrypt_stream(self, src, dst):
+        """
+        Decrypts a stream from encrypt_stream, verifying each chunk before
+        its plaintext is written. Raises ValueError at the first bad,
+        reordered or missing chunk; nothing after it is decrypted.
+        Returns the number of plaintext bytes written.
+        """
+        header = self._read_full(src, len(self.STREAM_MAGIC) + 13)
+        if len(header) < len(self.STREAM_MAGIC) + 13 or not header.startswith(self.STREAM_MAGIC):
+            raise ValueError("Not an encrypted stream")
+        if header[len(self.STREAM_MAGIC)] != self.STREAM_VERSION:
+            raise ValueError(f"Unsupported stream version {header[len(self.STREAM_MAGIC)]}")
+        (chunk_size,) = struct.unpack(">I", header[-12:-8])
+        prefix = header[-8:]
+
+        counter = 0
+        written = 0
+        while True:
+            length_word = self._read_full(src, 4)
+            if len(length_word) < 4: raise ValueError("Truncated stream (final chunk missing)")
+            (word,) = struct.unpack(">I", length_word)
+            length = word & ~self.FINAL_BIT
+            if length > chunk_size: raise ValueError(f"Chunk {counter} is too large")
+
+            record = self._read_full(src, length + 16)
+            if len(record) < length + 16: raise ValueError(f"Chunk {counter} is truncated")
+            try:
+                plain = self._chunk_cipher(prefix, counter, header + length_word).decrypt_and_verify(record[:length], record[length:])
+            except ValueError:
+                raise ValueError(f"Chunk {counter} failed authentication (key might be wrong or data corrupted)")
+            dst.write(plain)
+            written += len(plain)
+
+            if word & self.FINAL_BIT: return written
+            counter += 1
@@ -0,0 +1,123 @@
+class PayloadFramer:
+    """
+    Length-prefixed framing shared by the LSB, DCT and audio embedders.
+
+    Frame layout (all bytes):
+        MAGIC (2) | VERSION (1) | FLAGS (1) | LENGTH (varint, 1-10) | PAYLOAD
+    Extractors read the header first and then exactly LENGTH payload bytes,
+    so there is no delimiter scan and payloads may contain any byte values.
+    """
+    MAGIC = b"SW"
+    VERSION = 1
+    FLAG_TEXT = 0x01  # Payload was a str (stored as UTF-8)
+
+    MIN_HEADER = len(MAGIC) + 3  # Magic, version, flags and a 1-byte length
+
+    @staticmethod
+    def encode_varint(n):
+        """Unsigned LEB128: 7 bits per byte, high bit set on all but the last."""
+        if n < 0: raise ValueError("Length cannot be negative")
+        out = bytearray()
+        while True:
+            byte = n & 0x7F
+            n >>= 7
+            if n:
+                out.append(byte | 0x80)
+            else:
+                out.append(byte)
+                return bytes(out)
+
+    @staticmethod
+    def decode_varint(data, offset=0):
+        """Returns (value, next_offset). Raises ValueError if truncated."""
+        value = 0
+        shift = 0
+        for i in range(offset, min(len(data), offset + 10)):
+            value |= (data[i] & 0x7F) << shift
+            if not data[i] & 0x80:
+                return value, i + 1
+            shift += 7
+        raise ValueError("Truncated frame length")
+
+    @staticmethod
+    def pack(payload, flags=0):
+        """Wraps a str or bytes payload in a frame header."""
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+            flags |= PayloadFramer.FLAG_TEXT
+        payload = bytes(payload)
+        header = PayloadFramer.MAGIC + bytes([PayloadFramer.VERSION, flags])
+        return header + PayloadFramer.encode_varint(len(payload)) + payload
+
+    @staticmethod
+    def parse_header(data):
+        """Returns (flags, length, header_len). Raises ValueError if not a frame."""
+        magic_len = len(PayloadFramer.MAGIC)
+        if len(data) < PayloadFramer.MIN_HEADER or data[:magic_len] != PayloadFramer.MAGIC:
+            raise ValueError("No frame header found")
+        if data[magic_len] != PayloadFramer.VERSION:
+            raise ValueError(f"Unsupported frame version {data[magic_len]}")
+        flags = data[magic_len + 1]
+        length, header_len = PayloadFramer.decode_varint(data, magic_len + 2)
+        return flags, length, header_len
+
+    @staticmethod
+    def unpack(payload, flags):
+        """Turns the raw payload back into the type that was embedded."""
+        if flags & PayloadFramer.FLAG_TEXT:
+            return bytes(payload).decode('utf-8', errors='replace')
+        return bytes(payload)
+
+    @staticmethod
+    def read_frame(read_bytes):
+        """
+        Reads one frame from a carrier through read_bytes(offset, count),
+        which returns up to count payload bytes starting at byte offset.
+        Only the header and the declared payload bytes are ever requested.
+        Returns the payload (str or bytes) or None if no valid frame is found.
+        """
+        head = bytes(read_bytes(0, PayloadFramer.MIN_HEADER))
+        if head[:len(PayloadFramer.MAGIC)] != PayloadFramer.MAGIC: return None
+
+        # The varint continues while the high bit is set
+        while len(head) < PayloadFramer.MIN_HEADER + 9 and head[-1] & 0x80:
+            more = bytes(read_bytes(len(head), 1))
+            if not more: return None
+            head += more
+
+        try:
+            flags, length, header_len = PayloadFramer.parse_header(head)
+        except ValueError:
+            return None
+
+        body = bytes(read_bytes(header_len, length))
+        if len(body) < length: return None  # Carrier ended before the payload did
+        return PayloadFramer.unpack(body, flags)
+
+    # --- STRIPING (one payload spread over several carriers) ---
+    @staticmethod
+    def split(payload, n_chunks):
+        """
+        Frames payload once and cuts the frame into at most n_chunks slices,
+        each prefixed with varint(seq) and varint(total). Every slice is
+        embedded as its own bytes payload; join() reverses this.
+        """
+        framed = PayloadFramer.pack(payload)
+        size = -(-len(framed) // max(1, n_chunks))
+        total = -(-len(framed) // size)
+        return [PayloadFramer.encode_varint(seq) + PayloadFramer.encode_varint(total) +
+                framed[seq * size:(seq + 1) * size] for seq in range(total)]
+
+    @staticmethod
+    def parse_chunk(chunk):
+        """Returns (seq, total, data). Raises ValueError if not a valid slice."""
+        seq, offset = PayloadFramer.decode_varint(chunk)
+        total, offset = PayloadFramer.decode_varint(chunk, offset)
+        if seq >= total: raise ValueError("Invalid chunk sequence number")
+        return seq, total, bytes(chunk[offset:])
+
+    @staticmethod
+    def join(parts):
+        """Reassembles the slice data list (in seq order) into the original payload."""
+        framed = b"".join(parts)
+        return PayloadFramer.read_frame(lambda offset, count: framed[offset:offset + count])
@@ -1,40 +1,302 @@
 import cv2
+import csv
+import json
+import os
 import numpy as np
 import math
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# --- Batch worker (module level so it can be pickled) ---
+def _evaluate_pair(index, cover_path, stego_path, band_rows):
+    """Quality report for one cover/stego pair; errors are reported, not raised."""
+    result = {"index": index, "cover": cover_path, "stego": stego_path}
+    try:
+        result.update(StegoMetrics.quality_report(cover_path, stego_path, band_rows=band_rows))
+    except Exception as e:
+        result["error"] = str(e)
+    return result
 
 class StegoMetrics:
+    # SSIM constants for 8-bit images: (0.01 * 255)^2 and (0.03 * 255)^2
+    C1, C2 = 6.5025, 58.5225
+    # wPSNR noise visibility function strength (D in NVF = 1 / (1 + D * var / var_max))
+    NVF_D = 100.0
+
     @staticmethod
-    def calculate_psnr(original_path, stego_path):
-        """Calculates Peak Signal-to-Noise Ratio (PSNR). Higher is better."""
-        img1 = cv2.imread(original_path)
-        img2 = cv2.imread(stego_path)
-        
-        if img1 is None or img2 is None:
-            raise ValueError("One of the images could not be loaded.")
-
-        # --- FIX START: Handle Dimension Mismatch ---
-        # DWT sometimes crops 1 pixel to make dimensions even.
-        # We must align both images to the smaller size to compare them fairly.
-        h1, w1, _ = img1.shape
-        h2, w2, _ = img2.shape
-        
-        h_min = min(h1, h2)
-        w_min = min(w1, w2)
-        
-        # Crop both to the minimum common size
-        img1 = img1[:h_min, :w_min]
-        img2 = img2[:h_min, :w_min]
-        # --- FIX END ---
-        
-        # Mean Squared Error (MSE)
-        mse = np.mean((img1 - img2) ** 2)
-        
+    def load_image(image):
+        """Accepts a path or an already-decoded BGR ndarray."""
+        if isinstance(image, np.ndarray): return image
+        img = cv2.imread(image)
+        if img is None: raise ValueError(f"Image could not be loaded: {image}")
+        return img
+
+    @staticmethod
+    def align(img1, img2):
+        """
+        DWT sometimes crops 1 pixel to make dimensions even.
+        We must align both images to the smaller size to compare them fairly.
+        """
+        h_min = min(img1.shape[0], img2.shape[0])
+        w_min = min(img1.shape[1], img2.shape[1])
+        return img1[:h_min, :w_min], img2[:h_min, :w_min]
+
+    @staticmethod
+    def to_gray(img):
+        """Float32 grayscale plane of a BGR (or already gray) image."""
+        if img.ndim == 3: img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return np.float32(img)
+
+    @staticmethod
+    def _psnr(mse):
         if mse == 0:
             return 100  # Images are identical
-            
         max_pixel = 255.0
-        psnr = 20 * math.log10(max_pixel / math.sqrt(mse))
-        return psnr
+        return 20 * math.log10(max_pixel / math.sqrt(mse))
+
+    @staticmethod
+    def _moments(gray1, gray2):
+        """Gaussian-windowed means, variances and covariance (11x11, sigma 1.5)."""
+        blur = lambda x: cv2.GaussianBlur(x, (11, 11), 1.5)
+        mu1, mu2 = blur(gray1), blur(gray2)
+        sigma1_sq = blur(gray1 * gray1) - mu1 * mu1
+        sigma2_sq = blur(gray2 * gray2) - mu2 * mu2
+        sigma12 = blur(gray1 * gray2) - mu1 * mu2
+        return mu1, mu2, sigma1_sq, sigma2_sq, sigma12
+
+    @staticmethod
+    def _ssim_map(moments):
+        C1, C2 = StegoMetrics.C1, StegoMetrics.C2
+        mu1, mu2, sigma1_sq, sigma2_sq, sigma12 = moments
+        return ((2 * mu1 * mu2 + C1) * (2 * sigma12 + C2)) / ((mu1 * mu1 + mu2 * mu2 + C1) * (sigma1_sq + sigma2_sq + C2))
+
+    @staticmethod
+    def _ssim(moments):
+        return float(np.mean(StegoMetrics._ssim_map(moments), dtype=np.float64))
+
+    @staticmethod
+    def _nvf_sq_error(diff, local_var, var_max):
+        """Sum of squared errors weighted by the Noise Visibility Function of the original."""
+        local_var = np.maximum(local_var, 0)  # Float rounding can dip just below 0
+        nvf = 1.0 / (1.0 + (StegoMetrics.NVF_D / var_max) * local_var) if var_max > 0 else np.ones_like(local_var)
+        if diff.ndim == 3: nvf = nvf[:, :, None]
+        return float(np.sum(np.square(nvf * diff), dtype=np.float64))
+
+    @staticmethod
+    def _wpsnr(diff, local_var):
+        """PSNR with errors in smooth regions of the original (where they are visible) weighted up."""
+        var_max = max(float(local_var.max()), 0.0)
+        return StegoMetrics._psnr(StegoMetrics._nvf_sq_error(diff, local_var, var_max) / diff.size)
+
+    @staticmethod
+    def calculate_mse(original, stego):
+        """Mean Squared Error over all channels (computed in float, no uint8 wraparound)."""
+        img1, img2 = StegoMetrics.align(StegoMetrics.load_image(original), StegoMetrics.load_image(stego))
+        return float(np.mean(np.square(np.float32(img1) - np.float32(img2)), dtype=np.float64))
+
+    @staticmethod
+    def calculate_psnr(original_path, stego_path):
+        """Calculates Peak Signal-to-Noise Ratio (PSNR). Higher is better. Takes paths or arrays."""
+        return StegoMetrics._psnr(StegoMetrics.calculate_mse(original_path, stego_path))
+
+    @staticmethod
+    def calculate_wpsnr(original, stego):
+        """Weighted PSNR: errors in smooth regions (where they are visible) count more."""
+        return StegoMetrics.quality_report(original, stego)["wpsnr"]
+
+    @staticmethod
+    def calculate_ssim(original, stego):
+        """Structural Similarity (grayscale, Gaussian window). 1.0 means identical."""
+        img1, img2 = StegoMetrics.align(StegoMetrics.load_image(original), StegoMetrics.load_image(stego))
+        return StegoMetrics._ssim(StegoMetrics._moments(StegoMetrics.to_gray(img1), StegoMetrics.to_gray(img2)))
+
+    @staticmethod
+    def calculate_ber(original, recovered):
+        """
+        Bit Error Rate between the embedded and the recovered message (str or bytes).
+        Missing or extra bits count as errors; nothing recovered scores 0.5 (a coin flip).
+        """
+        def to_bits(data):
+            if isinstance(data, str):
+                try: data = data.encode('latin-1')  # One byte per char, as the legacy extractors decode
+                except UnicodeEncodeError: data = data.encode('utf-8')
+            return np.unpackbits(np.frombuffer(bytes(data), dtype=np.uint8))
+
+        if not recovered: return 0.5
+        bits_orig, bits_rec = to_bits(original), to_bits(recovered)
+        min_len = min(len(bits_orig), len(bits_rec))
+        max_len = max(len(bits_orig), len(bits_rec))
+        if max_len == 0: return 0.0
+        errors = np.count_nonzero(bits_orig[:min_len] != bits_rec[:min_len]) + (max_len - min_len)
+        return float(errors / max_len)
+
+    @staticmethod
+    def quality_report(original, stego, message=None, recovered=None, band_rows=None):
+        """
+        Full quality report in one pass: each image is decoded once, converted
+        to float32 once, and PSNR/wPSNR/MSE/SSIM share one set of blurred moments.
+        Returns a dict with mse, psnr, wpsnr, ssim (and ber if message is given).
+        band_rows switches to the constant-memory tiled mode (quality_report_tiled).
+        """
+        if band_rows:
+            return StegoMetrics.quality_report_tiled(original, stego, message, recovered, band_rows)
+
+        img1, img2 = StegoMetrics.align(StegoMetrics.load_image(original), StegoMetrics.load_image(stego))
+        f1, f2 = np.float32(img1), np.float32(img2)
+        diff = f1 - f2
+        mse = float(np.mean(np.square(diff), dtype=np.float64))
+
+        moments = StegoMetrics._moments(StegoMetrics.to_gray(img1), StegoMetrics.to_gray(img2))
+        report = {
+            "mse": mse,
+            "psnr": StegoMetrics._psnr(mse),
+            "wpsnr": StegoMetrics._wpsnr(diff, moments[2]),
+            "ssim": StegoMetrics._ssim(moments),
+        }
+        if message is not None:
+            report["ber"] = StegoMetrics.calculate_ber(message, recovered)
+        return report
+
+    @staticmethod
+    def _bands(h, band_rows, halo):
+        """Yields (y0, y1, a0, a1): output rows y0:y1, read with halo rows a0:a1."""
+        for y0 in range(0, h, band_rows):
+            y1 = min(h, y0 + band_rows)
+            yield y0, y1, max(0, y0 - halo), min(h, y1 + halo)
+
+    @staticmethod
+    def quality_report_tiled(original, stego, message=None, recovered=None, band_rows=512):
+        """
+        quality_report for gigapixel images. Rows are processed in bands of
+        band_rows, each read with a halo of the Gaussian kernel radius (5 rows)
+        so the blurred moments match the full-frame ones exactly; only the
+        sums are accumulated, so the float32 temporaries are bounded by the
+        band size. Inputs may be memory-mapped arrays (e.g. np.load(mmap_mode='r')).
+        wPSNR needs the global peak local variance, which costs one extra
+        blur pass over the original.
+        """
+        img1, img2 = StegoMetrics.align(StegoMetrics.load_image(original), StegoMetrics.load_image(stego))
+        h = img1.shape[0]
+        halo = 5  # (11, 11) kernel
+
+        def band_moments(y0, y1, a0, a1):
+            gray1 = StegoMetrics.to_gray(img1[a0:a1])
+            gray2 = StegoMetrics.to_gray(img2[a0:a1])
+            keep = slice(y0 - a0, y1 - a0)
+            return [m[keep] for m in StegoMetrics._moments(gray1, gray2)]
+
+        # Pass 1: peak local variance of the original (the NVF normalizer)
+        var_max = 0.0
+        for y0, y1, a0, a1 in StegoMetrics._bands(h, band_rows, halo):
+            gray1 = StegoMetrics.to_gray(img1[a0:a1])
+            mu1 = cv2.GaussianBlur(gray1, (11, 11), 1.5)
+            sigma1_sq = cv2.GaussianBlur(gray1 * gray1, (11, 11), 1.5) - mu1 * mu1
+            var_max = max(var_max, float(sigma1_sq[y0 - a0:y1 - a0].max()))
+
+        # Pass 2: accumulate squared error, weighted squared error and SSIM sums
+        sq_sum = nvf_sum = ssim_sum = 0.0
+        for y0, y1, a0, a1 in StegoMetrics._bands(h, band_rows, halo):
+            diff = np.float32(img1[y0:y1]) - np.float32(img2[y0:y1])
+            moments = band_moments(y0, y1, a0, a1)
+            sq_sum += float(np.sum(np.square(diff), dtype=np.float64))
+            nvf_sum += StegoMetrics._nvf_sq_error(diff, moments[2], var_max)
+            ssim_sum += float(np.sum(StegoMetrics._ssim_map(moments), dtype=np.float64))
+
+        n_values = img1.size
+        mse = sq_sum / n_values
+        report = {
+            "mse": mse,
+            "psnr": StegoMetrics._psnr(mse),
+            "wpsnr": StegoMetrics._psnr(nvf_sum / n_values),
+            "ssim": ssim_sum / (img1.shape[0] * img1.shape[1]),
+        }
+        if message is not None:
+            report["ber"] = StegoMetrics.calculate_ber(message, recovered)
+        return report
+
+    # --- BATCH EVALUATION (CORPUS QA SWEEPS) ---
+    BATCH_FIELDS = ["index", "cover", "stego", "mse", "psnr", "wpsnr", "ssim", "error"]
+    IMAGE_EXTENSIONS = (".png", ".bmp", ".tif", ".tiff", ".jpg", ".jpeg", ".webp")
+
+    @staticmethod
+    def pair_directories(cover_dir, stego_dir):
+        """
+        Pairs every image in cover_dir with the stego image of the same name
+        (extension may differ, e.g. cover.png -> cover.jpg) in stego_dir.
+        Returns a sorted list of (cover_path, stego_path); unmatched covers are skipped.
+        """
+        def images(folder):
+            found = {}
+            for name in sorted(os.listdir(folder)):
+                stem, ext = os.path.splitext(name)
+                if ext.lower() in StegoMetrics.IMAGE_EXTENSIONS:
+                    found.setdefault(stem, os.path.join(folder, name))
+            return found
+
+        covers, stegos = images(cover_dir), images(stego_dir)
+        missing = len(covers) - len(covers.keys() & stegos.keys())
+        if missing: print(f"[!] {missing} cover images have no stego counterpart.")
+        return [(covers[stem], stegos[stem]) for stem in sorted(covers.keys() & stegos.keys())]
+
+    @staticmethod
+    def read_manifest(manifest_path):
+        """
+        Reads (cover_path, stego_path) pairs from a CSV (cover,stego columns;
+        header optional) or JSONL ({"cover": ..., "stego": ...}) manifest.
+        Relative paths are resolved against the manifest's folder.
+        """
+        base = os.path.dirname(os.path.abspath(manifest_path))
+        resolve = lambda path: path if os.path.isabs(path) else os.path.join(base, path)
+        pairs = []
+        with open(manifest_path, newline='') as f:
+            if manifest_path.lower().endswith(".jsonl"):
+                for line in f:
+                    if not line.strip(): continue
+                    entry = json.loads(line)
+                    pairs.append((resolve(entry["cover"]), resolve(entry["stego"])))
+            else:
+                for row in csv.reader(f):
+                    if len(row) < 2 or [c.strip().lower() for c in row[:2]] == ["cover", "stego"]: continue
+                    pairs.append((resolve(row[0].strip()), resolve(row[1].strip())))
+        return pairs
+
+    @staticmethod
+    def evaluate_batch(pairs, output_path=None, workers=None, max_in_flight=None, band_rows=None):
+        """
+        Computes quality_report for every (cover, stego) pair in a process pool.
+        At most max_in_flight pairs (default 2 per worker) are queued or being
+        decoded at once, so memory stays bounded on huge corpora.
+        Results are yielded as they complete and, if output_path is given,
+        streamed to it as JSONL or CSV (picked by extension).
+        """
+        workers = workers or os.cpu_count() or 4
+        max_in_flight = max_in_flight or 2 * workers
+        out = writer = None
+        if output_path:
+            out = open(output_path, "w", newline='')
+            if output_path.lower().endswith(".csv"):
+                writer = csv.DictWriter(out, fieldnames=StegoMetrics.BATCH_FIELDS, extrasaction='ignore')
+                writer.writeheader()
+
+        def emit(result):
+            if out is not None:
+                if writer is not None: writer.writerow(result)
+                else: out.write(json.dumps(result) + "\n")
+                out.flush()
+            return result
+
+        print(f"[*] Evaluating {len(pairs)} image pairs on {workers} workers...")
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                in_flight = set()
+                for index, (cover_path, stego_path) in enumerate(pairs):
+                    if len(in_flight) >= max_in_flight:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done: yield emit(future.result())
+                    in_flight.add(pool.submit(_evaluate_pair, index, cover_path, stego_path, band_rows))
+                for future in in_flight:
+                    yield emit(future.result())
+        finally:
+            if out is not None: out.close()
 
     @staticmethod
     def simulate_attack(image_path, output_path, attack_type="noise"):
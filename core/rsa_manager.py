@@ -1,8 +1,55 @@
 from Crypto.PublicKey import RSA
 from Crypto.Cipher import PKCS1_OAEP
+from collections import OrderedDict
 import os
+import threading
 
 class RSAManager:
+    # Parsed keys and their OAEP ciphers, keyed by (path, mtime, size), LRU-evicted
+    cache_size = 8
+    _key_cache = OrderedDict()
+    _cache_lock = threading.Lock()
+
+    @staticmethod
+    def load_key(key_path):
+        """
+        Returns (RsaKey, PKCS1_OAEP cipher) for a PEM file, parsing it only
+        once. A key file that is rewritten (new mtime or size) is re-parsed.
+        """
+        path = os.path.abspath(key_path)
+        stat = os.stat(path)
+        cache_key = (path, stat.st_mtime_ns, stat.st_size)
+        
+        with RSAManager._cache_lock:
+            entry = RSAManager._key_cache.get(cache_key)
+            if entry is not None:
+                RSAManager._key_cache.move_to_end(cache_key)
+                return entry
+        
+        with open(path, "rb") as f:
+            key = RSA.import_key(f.read())
+        entry = (key, PKCS1_OAEP.new(key))
+        
+        with RSAManager._cache_lock:
+            # Drop entries for older versions of the same file
+            for stale in [k for k in RSAManager._key_cache if k[0] == path]:
+                del RSAManager._key_cache[stale]
+            RSAManager._key_cache[cache_key] = entry
+            while len(RSAManager._key_cache) > RSAManager.cache_size:
+                RSAManager._key_cache.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def clear_key_cache(key_path=None):
+        """Forgets one cached key file, or every cached key if key_path is None."""
+        with RSAManager._cache_lock:
+            if key_path is None:
+                RSAManager._key_cache.clear()
+                return
+            path = os.path.abspath(key_path)
+            for stale in [k for k in RSAManager._key_cache if k[0] == path]:
+                del RSAManager._key_cache[stale]
+
     @staticmethod
     def generate_keys(save_dir="assets"):
         """Generates a 2048-bit RSA Key Pair."""
@@ -23,10 +70,8 @@ class RSAManager:
     @staticmethod
     def encrypt_session_key(aes_key_str, public_key_path):
         """Encrypts the AES session key using the Receiver's Public Key."""
-        with open(public_key_path, "rb") as f:
-            public_key = RSA.import_key(f.read())
-            
-        cipher_rsa = PKCS1_OAEP.new(public_key)
+        _, cipher_rsa = RSAManager.load_key(public_key_path)
+        
         # RSA can only encrypt small data, which is perfect for a 32-byte hex key
         enc_session_key = cipher_rsa.encrypt(aes_key_str.encode('utf-8'))
         
@@ -35,14 +80,28 @@ class RSAManager:
     @staticmethod
     def decrypt_session_key(enc_hex_key, private_key_path):
         """Decrypts the AES session key using your Private Key."""
-        with open(private_key_path, "rb") as f:
-            private_key = RSA.import_key(f.read())
-            
-        cipher_rsa = PKCS1_OAEP.new(private_key)
+        _, cipher_rsa = RSAManager.load_key(private_key_path)
         
         try:
             enc_bytes = bytes.fromhex(enc_hex_key)
             session_key = cipher_rsa.decrypt(enc_bytes)
             return session_key.decode('utf-8')
         except Exception as e:
-            raise ValueError("RSA Decryption Failed: Invalid Private Key or Corrupted Data.")
\ No newline at end of file
+            raise ValueError("RSA Decryption Failed: Invalid Private Key or Corrupted Data.")
+
+    @staticmethod
+    def decrypt_session_keys(enc_hex_keys, private_key_path):
+        """
+        Batch decrypt_session_key: the private key is parsed once for the
+        whole list. Returns the session keys in order, with None for any
+        entry that fails to decrypt.
+        """
+        _, cipher_rsa = RSAManager.load_key(private_key_path)
+        
+        session_keys = []
+        for enc_hex_key in enc_hex_keys:
+            try:
+                session_keys.append(cipher_rsa.decrypt(bytes.fromhex(enc_hex_key)).decode('utf-8'))
+            except Exception:
+                session_keys.append(None)
+        return session_keys
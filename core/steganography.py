@@ -1,5 +1,6 @@
 import cv2
 import numpy as np
+from core.framing import PayloadFramer
 
 class LSBSteganography:
     def __init__(self):
@@ -18,80 +19,75 @@ class LSBSteganography:
         else:
             raise TypeError("Input type not supported")
 
-    def encode(self, image_path, secret_message, output_path):
-        """Encodes a secret message into an image using LSB"""
+    def encode(self, image_path, secret_message, output_path, legacy=False):
+        """
+        Encodes a secret message (str or bytes) into an image using LSB.
+        The message is written as a length-prefixed frame; legacy=True
+        writes the old "$$$"-terminated text layout instead.
+        """
         # 1. Read the image
         image = cv2.imread(image_path)
         if image is None:
             raise ValueError(f"Image not found at {image_path}")
         
-        # 2. Append delimiter to message so we know when to stop reading later
-        secret_message += self.delimiter
+        # 2. Frame the message (or append the delimiter) so we know when to stop reading later
+        if legacy:
+            secret_message += self.delimiter
+        else:
+            secret_message = PayloadFramer.pack(secret_message)
         
-        # 3. Convert message to binary
-        binary_message = self.to_binary(secret_message)
-        data_len = len(binary_message)
+        # 3. Convert message to a bit array (one uint8 0/1 per bit)
+        if legacy:
+            binary_message = self.to_binary(secret_message)
+            bits = np.frombuffer(binary_message.encode(), dtype=np.uint8) - ord('0')
+        else:
+            bits = np.unpackbits(np.frombuffer(secret_message, dtype=np.uint8))
+        data_len = len(bits)
         
-        # 4. Check if image is big enough
-        max_bytes = image.shape[0] * image.shape[1] * 3 // 8
-        if len(secret_message) > max_bytes:
+        # 4. Check if image is big enough (one bit per B/G/R value)
+        if data_len > image.size:
             raise ValueError(f"Error: Insufficient bytes, need bigger image or less data.")
         
         print(f"[*] Encoding {data_len} bits into image...")
 
-        data_index = 0
-        
-        # 5. Iterate over pixels and modify LSB
-        # image.shape gives (height, width, channels)
-        for row in image:
-            for pixel in row:
-                # Modify Red, Green, Blue values (0, 1, 2)
-                for channel in range(3): 
-                    if data_index < data_len:
-                        # Get current pixel value binary
-                        pixel_bin = self.to_binary(pixel[channel])
-                        
-                        # Replace last bit with message bit
-                        # pixel_bin[:-1] takes all bits except last
-                        # binary_message[data_index] is the new bit
-                        new_bit = binary_message[data_index]
-                        new_pixel_bin = pixel_bin[:-1] + new_bit
-                        
-                        # Update pixel with new binary value
-                        pixel[channel] = int(new_pixel_bin, 2)
-                        data_index += 1
-                    else:
-                        break
-                if data_index >= data_len:
-                    break
-            if data_index >= data_len:
-                break
+        # 5. Modify LSBs in one masked assignment
+        # Flattening walks row -> pixel -> channel, the same order decode() reads
+        flat = image.reshape(-1)
+        flat[:data_len] = (flat[:data_len] & 0xFE) | bits
                 
         # 6. Save the result
         cv2.imwrite(output_path, image)
         print(f"[+] Saved encoded image to {output_path}")
 
-    def decode(self, image_path):
-        """Decodes the secret message from the stego-image"""
+    def decode(self, image_path, legacy=False):
+        """
+        Decodes the secret message from the stego-image.
+        Reads the frame header and then only the payload's bits; images
+        without a header fall back to the delimiter scan.
+        legacy=True scans for the old "$$$" delimiter directly.
+        """
         print("[*] Decoding...")
         image = cv2.imread(image_path)
-        binary_data = ""
+        if image is None:
+            raise ValueError(f"Image not found at {image_path}")
         
-        for row in image:
-            for pixel in row:
-                for channel in range(3):
-                    binary_val = self.to_binary(pixel[channel])
-                    binary_data += binary_val[-1] # Extract the last bit
-
-        # Group bits into 8 (bytes)
-        all_bytes = [binary_data[i: i+8] for i in range(0, len(binary_data), 8)]
+        if not legacy:
+            # Pixels are read row by row, B/G/R in turn - the same order encode() writes
+            flat = image.reshape(-1)
+            flat = flat[:len(flat) - (len(flat) % 8)]  # Whole bytes only
+            def read_bytes(offset, count):
+                return np.packbits(flat[offset * 8:(offset + count) * 8] & 1).tobytes()
+            
+            payload = PayloadFramer.read_frame(read_bytes)
+            if payload is not None: return payload
+            # No frame header: fall back to the "$$$" layout of older images
         
-        decoded_data = ""
-        for byte in all_bytes:
-            decoded_data += chr(int(byte, 2))
-            # Check if we found the delimiter
-            if decoded_data[-len(self.delimiter):] == self.delimiter:
-                # Return data without the delimiter
-                return decoded_data[:-len(self.delimiter)]
+        # Group LSBs into bytes and search for the delimiter
+        lsb = image.reshape(-1) & 1
+        data = np.packbits(lsb[:len(lsb) - (len(lsb) % 8)]).tobytes()
+        pos = data.find(self.delimiter.encode('latin-1'))
+        if pos != -1:
+            # Return data without the delimiter
+            return data[:pos].decode('latin-1')
                 
         return "No hidden message found (or delimiter missing)."
\ No newline at end of file
@@ -1,5 +1,6 @@
 import cv2
 import numpy as np
+from core.framing import PayloadFramer
 
 class DCTSteganography:
     def __init__(self):
@@ -7,6 +8,10 @@ class DCTSteganography:
         self.delimiter = "$$$"
         self.Q = 25  # Standard Quality for Images
         self.threshold = 80 
+        # Embedding tolerance: blocks whose exact result sits this close to a
+        # rounding boundary are re-done with cv2 so output matches it bit-for-bit.
+        self.tie_tolerance = 1e-3
+        self.chunk_blocks = 4096  # Blocks decoded per step in lazy extraction
 
     def to_binary(self, data):
         if isinstance(data, str):
@@ -15,6 +20,75 @@ class DCTSteganography:
             return ''.join([format(i, "08b") for i in data])
         return ""
 
+    def dct_basis(self):
+        """Orthonormal 8x8 DCT-II matrix (same scaling as cv2.dct)."""
+        n = self.block_size
+        k = np.arange(n).reshape(-1, 1)
+        x = np.arange(n).reshape(1, -1)
+        basis = np.cos((2 * x + 1) * k * np.pi / (2 * n)) * np.sqrt(2.0 / n)
+        basis[0, :] = np.sqrt(1.0 / n)
+        return basis
+
+    def block_view(self, channel):
+        """Views an (H, W) channel as an (H/8, W/8, 8, 8) block tensor (no copy)."""
+        h, w = channel.shape
+        n = self.block_size
+        return channel.reshape(h // n, n, w // n, n).swapaxes(1, 2)
+
+    def _quantize(self, coeffs, bits):
+        """Vectorized QIM: snaps each [4,4] coefficient to the lattice of its bit."""
+        Q = self.Q
+        q0 = np.round(coeffs / Q) * Q
+        q1 = (np.round((coeffs - (Q / 2)) / Q) * Q) + (Q / 2)
+        return np.where(bits == 1, q1, q0)
+
+    def _embed_block_cv2(self, block, bit):
+        """Reference single-block embed (the original per-block cv2 path)."""
+        dct_block = cv2.dct(block)
+        coeff = dct_block[4, 4]
+        if bit == 0:
+            new_coeff = round(coeff / self.Q) * self.Q
+        else:
+            new_coeff = (round((coeff - (self.Q / 2)) / self.Q) * self.Q) + (self.Q / 2)
+        dct_block[4, 4] = float(new_coeff)
+        return cv2.idct(dct_block)
+
+    def embed_blocks(self, B_float, block_idx, bits):
+        """
+        Batched embedding engine. Writes one bit into each block listed in
+        block_idx (flat raster index) of the float32 channel B_float, in place.
+
+        Only coefficient [4,4] changes, so DCT -> quantize -> IDCT collapses to a
+        projection onto the (4,4) basis image and a rank-1 update of each block,
+        done for all blocks at once. For 8-bit pixels every entry of that basis
+        image is +-1/8, so the math is exact in float32. Blocks that land exactly
+        on a rounding tie (quantizer midpoint, or whole-integer pixels before the
+        uint8 truncation) are left to cv2, so the result matches the loop exactly.
+        """
+        if len(block_idx) == 0: return
+        view = self.block_view(B_float)
+        rows, cols = np.divmod(block_idx, view.shape[1])
+        blocks = view[rows, cols]
+        bits = np.asarray(bits, dtype=np.uint8)
+
+        c4 = self.dct_basis()[4]
+        basis = np.float32(np.outer(c4, c4))
+        coeffs = np.einsum('nij,ij->n', blocks, basis)
+        delta = self._quantize(coeffs, bits) - coeffs
+        blocks += delta[:, None, None] * basis
+
+        # Exact ties are where cv2's float32 rounding noise decides the outcome
+        tol = self.tie_tolerance
+        offset = np.where(bits == 1, self.Q / 2, 0.0)
+        frac = ((coeffs - offset) / self.Q) % 1.0
+        on_tie = np.abs(frac - 0.5) < tol / self.Q
+        step = delta * np.abs(basis).max()
+        lands_on_int = np.abs(step - np.round(step)) < tol
+        for i in np.flatnonzero(on_tie | lands_on_int):
+            blocks[i] = self._embed_block_cv2(view[rows[i], cols[i]], bits[i])
+
+        view[rows, cols] = blocks
+
     def get_adaptive_map(self, img):
         """Generates the 'Map' of busy blocks (AI Brain)."""
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
@@ -25,121 +99,140 @@ class DCTSteganography:
         texture_map = cv2.dilate(edges, kernel, iterations=2)
         return texture_map
 
-    def dct_embed(self, image_path, message, output_path, use_adaptive=True):
+    def get_block_scores(self, img):
+        """Mean texture-map value of every 8x8 block, as one (H/8, W/8) grid."""
+        texture_map = self.get_adaptive_map(img)
+        h, w = texture_map.shape
+        texture_map = texture_map[:h - (h % 8), :w - (w % 8)]
+        return self.block_view(texture_map).mean(axis=(2, 3))
+
+    def get_eligible_mask(self, img):
+        """Boolean (H/8, W/8) mask of blocks busy enough to carry a bit."""
+        return self.get_block_scores(img) >= self.threshold
+
+    def get_usable_blocks(self, img, use_adaptive=True):
+        """Flat raster indices of the blocks that carry bits, in embedding order."""
+        h, w, _ = img.shape
+        if not use_adaptive:
+            return np.arange((h // 8) * (w // 8))
+        # IMAGE MODE: Calculate Map, then skip smooth blocks
+        return np.flatnonzero(self.get_eligible_mask(img))
+
+    def dct_embed(self, image_path, message, output_path, use_adaptive=True, legacy=False):
         """
-        Embeds message. 
+        Embeds message (str or bytes) as a length-prefixed frame.
         - If use_adaptive=True (Images): Uses AI Texture Analyzer.
         - If use_adaptive=False (Video): Skips AI, uses sequential embedding.
+        - legacy=True writes the old "$$$"-terminated text layout instead.
         """
         img = cv2.imread(image_path)
         if img is None: raise ValueError("Image not found")
         
+        cv2.imwrite(output_path, self.dct_embed_array(img, message, use_adaptive, legacy))
+
+    def dct_embed_array(self, img, message, use_adaptive=True, legacy=False):
+        """In-memory dct_embed: BGR ndarray in, stego ndarray (cropped to 8x8 blocks) out."""
         h, w, _ = img.shape
         h = h - (h % 8)
         w = w - (w % 8)
         img = img[:h, :w]
         
-        # --- MODE CHECK ---
-        if use_adaptive:
-            # IMAGE MODE: Calculate Map
-            texture_map = self.get_adaptive_map(img)
-        
         (B, G, R) = cv2.split(img)
         B_float = np.float32(B)
         
-        message += self.delimiter
-        binary_msg = self.to_binary(message)
-        msg_len = len(binary_msg)
-        msg_index = 0
+        if legacy:
+            message += self.delimiter
+            binary_msg = self.to_binary(message)
+            bits = np.frombuffer(binary_msg.encode(), dtype=np.uint8) - ord('0')
+        else:
+            bits = np.unpackbits(np.frombuffer(PayloadFramer.pack(message), dtype=np.uint8))
+        msg_len = len(bits)
         
         # Log which brain we are using
         mode_str = "Adaptive AI" if use_adaptive else "Sequential"
         print(f"[*] DCT Encoding Mode: {mode_str} (Q={self.Q})")
 
-        for r in range(0, h, 8):
-            for c in range(0, w, 8):
-                if msg_index >= msg_len: break
-                
-                # --- AI CHECK ---
-                if use_adaptive:
-                    # Only check the map if we are in Image Mode
-                    map_block = texture_map[r:r+8, c:c+8]
-                    if np.mean(map_block) < self.threshold:
-                        continue # Skip smooth blocks
-                
-                # Standard Embedding Logic...
-                block = B_float[r:r+8, c:c+8]
-                dct_block = cv2.dct(block)
-                
-                coeff = dct_block[4, 4]
-                bit = int(binary_msg[msg_index])
-                
-                if bit == 0:
-                    new_coeff = round(coeff / self.Q) * self.Q
-                else:
-                    new_coeff = (round((coeff - (self.Q / 2)) / self.Q) * self.Q) + (self.Q / 2)
-                
-                dct_block[4, 4] = float(new_coeff)
-                idct_block = cv2.idct(dct_block)
-                B_float[r:r+8, c:c+8] = idct_block
-                
-                msg_index += 1
-            if msg_index >= msg_len: break
+        # Blocks are visited in raster order; take the first msg_len usable ones
+        block_idx = self.get_usable_blocks(img, use_adaptive)[:msg_len]
+        if not legacy and len(block_idx) < msg_len:
+            raise ValueError(f"Message too large for this image ({msg_len} bits, {len(block_idx)} usable blocks)")
+        
+        self.embed_blocks(B_float, block_idx, bits[:len(block_idx)])
             
         B_out = np.uint8(np.clip(B_float, 0, 255))
         merged = cv2.merge((B_out, G, R))
-        cv2.imwrite(output_path, merged)
+        return merged
 
-    def dct_extract(self, stego_path, use_adaptive=True):
+    def extract_bits(self, B_float, block_idx):
+        """
+        Batched extraction engine: reads the bit carried by each block in
+        block_idx as one array operation. Remainders sitting exactly on the
+        Q/4 or 3Q/4 decision boundary are re-read with cv2.dct, matching the
+        original per-block loop bit-for-bit.
+        """
+        view = self.block_view(B_float)
+        rows, cols = np.divmod(block_idx, view.shape[1])
+        c4 = self.dct_basis()[4]
+        basis = np.float32(np.outer(c4, c4))
+        coeffs = np.einsum('nij,ij->n', view[rows, cols], basis)
+
+        lo, hi = self.Q / 4, 3 * self.Q / 4
+        remainder = coeffs % self.Q
+        on_edge = np.minimum(np.abs(remainder - lo), np.abs(remainder - hi)) < self.tie_tolerance
+        for i in np.flatnonzero(on_edge):
+            remainder[i] = cv2.dct(view[rows[i], cols[i]])[4, 4] % self.Q
+        return ((remainder > lo) & (remainder < hi)).astype(np.uint8)
+
+    def dct_extract(self, stego_path, use_adaptive=True, legacy=False, lazy=False):
         """
         Extracts message.
         - Must match the mode used during embedding!
+        - Framed payloads only touch the header blocks plus exactly the
+          payload's blocks. Images without a frame header (made before the
+          framed layout) fall back to the delimiter scan automatically.
+        - legacy=True scans for the old "$$$" delimiter instead; with
+          lazy=True it decodes chunk_blocks blocks at a time and stops as soon
+          as the delimiter shows up (fast for short payloads in large images).
         """
         img = cv2.imread(stego_path)
         if img is None: raise ValueError("Image not found")
         
+        return self.dct_extract_array(img, use_adaptive, legacy, lazy)
+
+    def dct_extract_array(self, img, use_adaptive=True, legacy=False, lazy=False):
+        """In-memory dct_extract for a BGR ndarray."""
         h, w, _ = img.shape
         h = h - (h % 8)
         w = w - (w % 8)
         img = img[:h, :w]
         
-        if use_adaptive:
-            texture_map = self.get_adaptive_map(img)
+        block_idx = self.get_usable_blocks(img, use_adaptive)
+        block_idx = block_idx[:len(block_idx) - (len(block_idx) % 8)]  # Whole bytes only
+        if len(block_idx) == 0: return "No hidden message found."  # e.g. adaptive mode on a flat image
         
         (B, _, _) = cv2.split(img)
         B_float = np.float32(B)
         
-        extracted_bits = ""
+        if not legacy:
+            def read_bytes(offset, count):
+                bits = self.extract_bits(B_float, block_idx[offset * 8:(offset + count) * 8])
+                return np.packbits(bits).tobytes()
+            
+            payload = PayloadFramer.read_frame(read_bytes)
+            if payload is not None: return payload
+            # No frame header: fall back to the "$$$" layout of older images
         
-        for r in range(0, h, 8):
-            for c in range(0, w, 8):
-                # --- AI CHECK ---
-                if use_adaptive:
-                    map_block = texture_map[r:r+8, c:c+8]
-                    if np.mean(map_block) < self.threshold:
-                        continue
-                
-                block = B_float[r:r+8, c:c+8]
-                dct_block = cv2.dct(block)
-                
-                coeff = dct_block[4, 4]
-                remainder = coeff % self.Q
-                
-                if remainder > (self.Q / 4) and remainder < (3 * self.Q / 4):
-                    extracted_bits += '1'
-                else:
-                    extracted_bits += '0'
+        delimiter = self.delimiter.encode('latin-1')
+        step = len(block_idx) if not lazy else max(8, self.chunk_blocks - (self.chunk_blocks % 8))
+        data = bytearray()
         
-        message = ""
-        for i in range(0, len(extracted_bits), 8):
-            byte = extracted_bits[i:i+8]
-            if len(byte) < 8: break
-            try:
-                char = chr(int(byte, 2))
-                message += char
-            except:
-                continue
-            if message.endswith(self.delimiter):
-                return message[:-len(self.delimiter)]
+        for start in range(0, len(block_idx), step):
+            bits = self.extract_bits(B_float, block_idx[start:start + step])
+            data += np.packbits(bits).tobytes()
+            
+            # Only the new bytes (plus a delimiter-sized overlap) need searching
+            pos = data.find(delimiter, max(0, len(data) - len(bits) // 8 - len(delimiter) + 1))
+            if pos != -1:
+                return data[:pos].decode('latin-1')
                 
-        return "No hidden message found."
\ No newline at end of file
+        return "No hidden message found."
@@ -1,15 +1,209 @@
 import cv2
 import os
+import queue
+import threading
 import numpy as np
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from core.framing import PayloadFramer
 from core.steganography_dct import DCTSteganography
 from core.watermark import WatermarkHandler
 
+# --- Process-pool workers (module level so they can be pickled) ---
+_worker_stego = None
+_worker_buffers = {}
+
+def _init_worker(video_stego):
+    global _worker_stego
+    _worker_stego = video_stego
+
+def _embed_shared_frame(buffer_name, shape, frame_idx, message):
+    """
+    Embeds the frame stored in a shared-memory slot and writes the result
+    back into the same slot. Returns (result_shape, error_or_None).
+    """
+    if buffer_name not in _worker_buffers:
+        _worker_buffers[buffer_name] = shared_memory.SharedMemory(name=buffer_name)
+    buf = _worker_buffers[buffer_name].buf
+    
+    print(f"    > Embedding data in Frame {frame_idx}...")
+    try:
+        result = _worker_stego.embed_frame(np.ndarray(shape, dtype=np.uint8, buffer=buf), message)
+    except Exception as e:
+        return shape, str(e)
+    
+    # The result may be cropped (even / 8x8 sizes), so store it contiguously
+    np.ndarray(result.shape, dtype=np.uint8, buffer=buf)[...] = result
+    return result.shape, None
+
 class VideoStego:
     def __init__(self):
         self.stego = DCTSteganography()
         self.watermarker = WatermarkHandler("assets/watermark.png")
+        # Pipelined mode: frames in flight between reader and writer, and embed threads
+        self.queue_size = 32
+        self.pipeline_threads = os.cpu_count() or 4
+        # Codecs where every frame is a keyframe, so seeking costs one decode
+        self.intra_only_codecs = {"HFYU", "FFVH", "FFV1", "MJPG", "PNG ", "UYVY", "YUY2"}
+
+    def embed_frame(self, frame, message):
+        """
+        Watermark -> DCT embed -> fragile seal, entirely in memory.
+        The watermark goes into a copy, so if a later step raises, the
+        caller (serial, pipelined or shared-memory slot) still holds the
+        original frame and writes it out unchanged.
+        """
+        frame = self.watermarker.embed_watermark_inplace(frame.copy())
+        
+        # --- FIX 3: Disable Adaptive Mode (use_adaptive=False) ---
+        # We force sequential embedding to avoid sync errors.
+        frame = self.stego.dct_embed_array(frame, message, use_adaptive=False)
+        
+        return self.watermarker.embed_fragile_seal_array(frame)
+
+    def scan_frame(self, frame):
+        """Checks the seal and extracts the message of one frame, in memory."""
+        valid, status = self.watermarker.verify_fragile_seal_array(frame)
+        seal_status = "✅ Valid" if valid else "❌ Broken"
         
-    def embed_in_video(self, video_path, message, output_path, frame_interval=100):
+        # --- FIX 3: Disable Adaptive Mode here too ---
+        msg = self.stego.dct_extract_array(frame, use_adaptive=False)
+        return seal_status, msg
+        
+    def carrier_payload(self, payloads, frame_idx, frame_interval):
+        """Payload for a carrier frame; striped chunks repeat if carriers outnumber them."""
+        return payloads[(frame_idx // frame_interval) % len(payloads)]
+
+    def _embed_pipelined(self, cap, out, payloads, frame_interval):
+        """
+        Three-stage transcode: a reader thread (cap.read), a thread pool
+        embedding the carrier frames and a writer thread (out.write).
+        One bounded FIFO queue between them keeps frame order and caps how
+        many decoded frames are held in memory. OpenCV and NumPy release
+        the GIL, so decode, embed and encode overlap.
+        """
+        pending = queue.Queue(maxsize=self.queue_size)
+        errors = []
+        embedded = [0]
+
+        def process(frame_idx, frame):
+            print(f"    > Embedding data in Frame {frame_idx}...")
+            try:
+                return self.embed_frame(frame, self.carrier_payload(payloads, frame_idx, frame_interval)), True
+            except Exception as e:
+                print(f"    [!] Error processing frame {frame_idx}: {e}")
+                return frame, False
+
+        def reader(pool):
+            try:
+                frame_idx = 0
+                while not errors:
+                    ret, frame = cap.read()
+                    if not ret: break
+                    if frame_idx % frame_interval == 0:
+                        pending.put(pool.submit(process, frame_idx, frame))
+                    else:
+                        pending.put(frame)
+                    frame_idx += 1
+            except Exception as e:
+                errors.append(e)
+            finally:
+                pending.put(None)
+
+        def writer():
+            while True:
+                item = pending.get()
+                if item is None: break
+                if errors: continue  # Keep draining so the reader never blocks
+                try:
+                    if isinstance(item, Future):
+                        item, ok = item.result()
+                        embedded[0] += ok
+                    out.write(item)
+                except Exception as e:
+                    errors.append(e)
+
+        with ThreadPoolExecutor(max_workers=self.pipeline_threads) as pool:
+            threads = [threading.Thread(target=reader, args=(pool,)), threading.Thread(target=writer)]
+            for t in threads: t.start()
+            for t in threads: t.join()
+
+        if errors: raise errors[0]
+        return embedded[0]
+
+    def _embed_multiprocess(self, cap, out, payloads, frame_interval, workers):
+        """
+        Sends carrier frames to a ProcessPoolExecutor. Frames travel through
+        a ring of shared-memory slots (only the slot name is pickled), and a
+        FIFO of in-flight frames is drained in order into the writer.
+        """
+        n_slots = workers * 2
+        slots = []
+        free = []
+        in_flight = deque()
+        embedded = 0
+        
+        def write_oldest():
+            frame_idx, item, slot = in_flight.popleft()
+            if slot is None:
+                out.write(item)
+                return 0
+            shape, error = item.result()
+            if error: print(f"    [!] Error processing frame {frame_idx}: {error}")
+            out.write(np.ndarray(shape, dtype=np.uint8, buffer=slots[slot].buf))
+            free.append(slot)
+            return 0 if error else 1
+        
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,))
+        try:
+            frame_idx = 0
+            while True:
+                ret, frame = cap.read()
+                if not ret: break
+                
+                is_carrier = frame_idx % frame_interval == 0
+                
+                # Bound memory: drain the oldest frames once the queue or the slot ring is full
+                slots_full = not free and len(slots) == n_slots
+                while in_flight and (len(in_flight) >= self.queue_size or (is_carrier and slots_full)):
+                    embedded += write_oldest()
+                    slots_full = not free and len(slots) == n_slots
+                
+                if is_carrier:
+                    if not free:
+                        slots.append(shared_memory.SharedMemory(create=True, size=frame.nbytes))
+                        free.append(len(slots) - 1)
+                    slot = free.pop()
+                    if slots[slot].size < frame.nbytes: raise ValueError("Frame size changed mid-stream")
+                    np.ndarray(frame.shape, dtype=np.uint8, buffer=slots[slot].buf)[...] = frame
+                    payload = self.carrier_payload(payloads, frame_idx, frame_interval)
+                    future = pool.submit(_embed_shared_frame, slots[slot].name, frame.shape, frame_idx, payload)
+                    in_flight.append((frame_idx, future, slot))
+                else:
+                    in_flight.append((frame_idx, frame, None))
+                frame_idx += 1
+            
+            while in_flight:
+                embedded += write_oldest()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            for shm in slots:
+                shm.close()
+                shm.unlink()
+        return embedded
+
+    def embed_in_video(self, video_path, message, output_path, frame_interval=100, pipelined=False, workers=None,
+                       striped=False):
+        """
+        Embeds message into every frame_interval-th frame.
+        pipelined=True overlaps decoding, embedding and encoding on threads.
+        workers=N embeds carrier frames in N processes (shared-memory frames).
+        striped=True splits the message into numbered chunks, one per carrier
+        frame, instead of repeating all of it in every carrier. The chunk count
+        comes from CAP_PROP_FRAME_COUNT; if the container over-reports it and
+        fewer carriers get a chunk, ValueError is raised after writing.
+        """
         if not os.path.exists(video_path): raise ValueError(f"Input video not found.")
         
         cap = cv2.VideoCapture(video_path)
@@ -20,6 +214,15 @@ class VideoStego:
         fps    = cap.get(cv2.CAP_PROP_FPS)
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
+        payloads = [message]
+        if striped:
+            n_carriers = max(1, -(-total_frames // frame_interval))
+            payloads = PayloadFramer.split(message, n_carriers)
+            needed = len(PayloadFramer.pack(payloads[0])) * 8
+            if needed > (height // 8) * (width // 8):
+                cap.release()
+                raise ValueError(f"Message too large for this video ({needed} bits per frame over {n_carriers} frames)")
+        
         # --- FIX 1: Use HuffYUV (HFYU) Codec ---
         # Best balance of compatibility and lossless storage on Windows.
         fourcc = cv2.VideoWriter_fourcc(*'HFYU') 
@@ -34,46 +237,62 @@ class VideoStego:
         
         print(f"[*] Starting Video Embedding (HFYU/Q=60) - {total_frames} frames...")
         
-        while True:
-            ret, frame = cap.read()
-            if not ret: break
-            
-            if frame_idx % frame_interval == 0:
-                print(f"    > Embedding data in Frame {frame_idx}...")
-                temp_out = f"assets/temp_frame_{frame_idx}_stego.png"
+        try:
+            if workers:
+                embedded_count = self._embed_multiprocess(cap, out, payloads, frame_interval, workers)
+            elif pipelined:
+                embedded_count = self._embed_pipelined(cap, out, payloads, frame_interval)
+            else:
+                while True:
+                    ret, frame = cap.read()
+                    if not ret: break
                 
-                try:
-                    self.watermarker.embed_watermark_to_frame(frame, temp_out)
-                    
-                    # --- FIX 3: Disable Adaptive Mode (use_adaptive=False) ---
-                    # We force sequential embedding to avoid sync errors.
-                    self.stego.dct_embed(temp_out, message, temp_out, use_adaptive=False)
+                    if frame_idx % frame_interval == 0:
+                        print(f"    > Embedding data in Frame {frame_idx}...")
                     
-                    self.watermarker.embed_fragile_seal(temp_out, temp_out)
-                    frame = cv2.imread(temp_out)
-                    embedded_count += 1
-                    
-                    if os.path.exists(temp_out): os.remove(temp_out)
-                except Exception as e:
-                    print(f"    [!] Error processing frame {frame_idx}: {e}")
+                        try:
+                            frame = self.embed_frame(frame, self.carrier_payload(payloads, frame_idx, frame_interval))
+                            embedded_count += 1
+                        except Exception as e:
+                            print(f"    [!] Error processing frame {frame_idx}: {e}")
 
-            out.write(frame)
-            frame_idx += 1
-            
-        self.stego.Q = original_Q
-        cap.release()
-        out.release()
+                    out.write(frame)
+                    frame_idx += 1
+        finally:
+            self.stego.Q = original_Q
+            cap.release()
+            out.release()
+        
         print(f"[*] Video saved to {output_path}")
+        if striped and embedded_count < len(payloads):
+            raise ValueError(f"Only {embedded_count} of {len(payloads)} chunks were embedded; "
+                             f"the message cannot be reassembled (frame count over-reported?)")
         return embedded_count
 
-    def extract_from_video(self, video_path, frame_interval=100):
+    def extract_from_video(self, video_path, frame_interval=100, max_hits=None, seek=None, striped=False):
+        """
+        Scans every frame_interval-th frame for hidden messages.
+        Non-carrier frames are never decoded into images: they are skipped
+        with cap.grab(), or jumped over with CAP_PROP_POS_FRAMES when the
+        codec is intra-only (seek=None picks this automatically).
+        max_hits stops the scan after that many frames with a message.
+        striped=True collects numbered chunks, stops once all of them have
+        been seen and returns a single reassembled result.
+        """
         if not os.path.exists(video_path): raise ValueError(f"File not found.")
 
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened(): raise ValueError("Could not open video file.")
         
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fourcc = (int(cap.get(cv2.CAP_PROP_FOURCC)) & 0xFFFFFFFF).to_bytes(4, 'little').decode('latin-1')
+        if seek is None:
+            seek = frame_interval > 1 and total_frames > 0 and fourcc.upper() in self.intra_only_codecs
+        
         frame_idx = 0
         results = []
+        chunks = {}
+        n_chunks = None
         
         original_Q = self.stego.Q
         self.stego.Q = 60
@@ -81,34 +300,53 @@ class VideoStego:
         print(f"[*] Scanning Video for Secrets...")
         
         while True:
+            if seek:
+                if frame_idx >= total_frames: break
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
             ret, frame = cap.read()
             if not ret: break
             
-            if frame_idx % frame_interval == 0:
-                print(f"    > Scanning Frame {frame_idx}...")
-                temp_frame = f"assets/temp_extract_{frame_idx}.png"
-                cv2.imwrite(temp_frame, frame)
+            print(f"    > Scanning Frame {frame_idx}...")
+            
+            try:
+                seal_status, msg = self.scan_frame(frame)
                 
-                try:
-                    valid, status = self.watermarker.verify_fragile_seal(temp_frame)
-                    seal_status = "✅ Valid" if valid else "❌ Broken"
-                    
-                    # --- FIX 3: Disable Adaptive Mode here too ---
-                    msg = self.stego.dct_extract(temp_frame, use_adaptive=False)
-                    
-                    if "No hidden message" not in msg:
-                        results.append({"frame": frame_idx, "seal": seal_status, "message": msg})
-                        print(f"      [FOUND] Frame {frame_idx}: {msg} ({seal_status})")
-                    else:
-                        print(f"      [MISS] Frame {frame_idx} empty.")
-                        
-                except Exception as e:
-                    print(f"Error: {e}")
+                if isinstance(msg, str) and "No hidden message" in msg:
+                    print(f"      [MISS] Frame {frame_idx} empty.")
+                elif striped:
+                    seq, total, data = PayloadFramer.parse_chunk(msg)
+                    if n_chunks is None: n_chunks = total
+                    if total == n_chunks:
+                        chunks[seq] = data
+                        results.append({"frame": frame_idx, "seal": seal_status})
+                        print(f"      [CHUNK] Frame {frame_idx}: {seq + 1}/{total} ({seal_status})")
+                else:
+                    results.append({"frame": frame_idx, "seal": seal_status, "message": msg})
+                    print(f"      [FOUND] Frame {frame_idx}: {msg} ({seal_status})")
                     
-                if os.path.exists(temp_frame): os.remove(temp_frame)
-                
-            frame_idx += 1
+            except Exception as e:
+                print(f"Error: {e}")
+            
+            if striped and n_chunks is not None and len(chunks) == n_chunks: break
+            if not striped and max_hits and len(results) >= max_hits: break
+            
+            # Skip to the next carrier without decoding the frames in between
+            if not seek:
+                skipped = 0
+                while skipped < frame_interval - 1 and cap.grab(): skipped += 1
+                if skipped < frame_interval - 1: break
+            frame_idx += frame_interval
             
         self.stego.Q = original_Q
         cap.release()
-        return results
\ No newline at end of file
+        
+        if striped:
+            if n_chunks is None or len(chunks) < n_chunks:
+                print(f"    [!] Incomplete stripe set: {len(chunks)}/{n_chunks or '?'} chunks found.")
+                return []
+            message = PayloadFramer.join([chunks[seq] for seq in range(n_chunks)])
+            if message is None: return []
+            all_valid = all(r["seal"] == "✅ Valid" for r in results)
+            return [{"frame": results[0]["frame"], "frames": [r["frame"] for r in results],
+                     "seal": "✅ Valid" if all_valid else "❌ Broken", "message": message}]
+        return results
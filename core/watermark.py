@@ -1,12 +1,70 @@
 import cv2
+import os
 import pywt
+import struct
+import threading
 import numpy as np
 import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 class WatermarkHandler:
     def __init__(self, watermark_path="assets/watermark.png"):
         self.watermark_path = watermark_path
         self.alpha = 0.2 
+        # Tiled seal: tile edge in pixels (a 256-px last row holds a full
+        # SHA-256 digest) and hashing threads (hashlib releases the GIL)
+        self.seal_tile = 256
+        self.seal_workers = os.cpu_count() or 4
+        # Logo cache: the inverted logo is read once, and scaled planes
+        # (alpha * logo, float32) are kept per target size, LRU-evicted
+        self.logo_cache_size = 8
+        self._logo = None
+        self._logo_planes = OrderedDict()
+        self._logo_lock = threading.Lock()
+        # Per-thread DWT work buffers (see embed_watermark_inplace)
+        self._local = threading.local()
+        # Memory-mapped HH references by path (see save_reference)
+        self._references = {}
+
+    def __getstate__(self):
+        # Locks and thread-locals cannot be pickled (the video process pool ships a copy of us)
+        state = self.__dict__.copy()
+        del state['_logo_lock'], state['_local']
+        state['_references'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._logo_lock = threading.Lock()
+        self._local = threading.local()
+
+    def get_logo_plane(self, w, h):
+        """
+        Returns alpha * inverted logo resized to (w, h) as float32.
+        The logo file is read once; planes are cached per (w, h, alpha), so
+        repeat embeds at one resolution do no I/O or resizing.
+        The returned array is shared, so it is read-only. Being float32
+        (not float64) it shifts ~20% of watermarked blue pixels by +-1.
+        """
+        key = (w, h, self.alpha, self.watermark_path)
+        with self._logo_lock:
+            plane = self._logo_planes.get(key)
+            if plane is not None:
+                self._logo_planes.move_to_end(key)
+                return plane
+
+            if self._logo is None or self._logo[0] != self.watermark_path:
+                logo = cv2.imread(self.watermark_path, cv2.IMREAD_GRAYSCALE)
+                if logo is None: raise ValueError("Watermark logo not found")
+                self._logo = (self.watermark_path, cv2.bitwise_not(logo))
+
+            plane = np.float32(self.alpha * cv2.resize(self._logo[1], (w, h)))
+            plane.flags.writeable = False
+            self._logo_planes[key] = plane
+            while len(self._logo_planes) > self.logo_cache_size:
+                self._logo_planes.popitem(last=False)
+            return plane
 
     # --- ROBUST LAYER (DWT) ---
     def embed_watermark(self, image_path, output_path):
@@ -16,59 +74,144 @@ class WatermarkHandler:
         img = cv2.imread(image_path)
         if img is None: raise ValueError(f"Image not found: {image_path}")
         
+        cv2.imwrite(output_path, self.embed_watermark_array(img))
+        return output_path
+
+    def embed_watermark_array(self, img):
+        """In-memory embed_watermark: BGR ndarray in, watermarked ndarray (cropped to even size) out."""
         h, w, _ = img.shape
         # Ensure even dimensions
         h = h if h % 2 == 0 else h - 1
         w = w if w % 2 == 0 else w - 1
-        img = img[:h, :w]
+        return self.embed_watermark_inplace(img[:h, :w].copy())
 
-        logo = cv2.imread(self.watermark_path, cv2.IMREAD_GRAYSCALE)
-        if logo is None: raise ValueError("Watermark logo not found")
-        logo = cv2.bitwise_not(logo)
-        
-        logo = cv2.resize(logo, (w//2, h//2))
-        
-        (B, G, R) = cv2.split(img)
-        img_float = np.float32(B) 
-        
-        coeffs = pywt.dwt2(img_float, 'haar')
-        LL, (LH, HL, HH) = coeffs
-        
-        # Embed in HH (High Frequency) for invisibility
-        watermark_embedding = self.alpha * logo
-        HH_new = HH + watermark_embedding 
-        
-        new_coeffs = (LL, (LH, HL, HH_new))
-        img_reconstructed = pywt.idwt2(new_coeffs, 'haar')
-        
-        img_reconstructed = np.clip(img_reconstructed, 0, 255)
-        img_reconstructed = np.uint8(img_reconstructed)
-        
-        merged_img = cv2.merge((img_reconstructed, G, R))
-        cv2.imwrite(output_path, merged_img)
-        return output_path
+    def _work_buffers(self, h, w):
+        """Per-thread float32 scratch planes, reused while the frame size stays the same."""
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None or buffers[0].shape != (h, w):
+            buffers = (np.empty((h, w), np.float32), np.empty((h // 2, w // 2), np.float32))
+            self._local.buffers = buffers
+        return buffers
+
+    def embed_watermark_inplace(self, img):
+        """
+        Batch/video embed_watermark: adds the watermark to the B channel of
+        img in place (G and R are never touched) and returns img.
+        Only HH changes, so the inverse Haar step reduces to adding +-HH/2
+        to each pixel of a 2x2 block; that runs in reused float32 buffers
+        instead of a full dwt2/idwt2 round trip. An odd last row/column is
+        left unmarked.
+        Not bit-identical to the original pywt float64 path: float32
+        rounding changes about 64% of blue pixels by +-1 on natural images
+        (lena, baboon), about 20% of them from the float32 logo plane alone.
+        G, R and watermark extraction are unaffected.
+        """
+        h, w, _ = img.shape
+        h = h if h % 2 == 0 else h - 1
+        w = w if w % 2 == 0 else w - 1
+
+        watermark_embedding = self.get_logo_plane(w//2, h//2)
+        B_float, half = self._work_buffers(h, w)
+        B = img[:h, :w, 0]
+        np.copyto(B_float, B)
+        np.multiply(watermark_embedding, 0.5, out=half)
+
+        # Embed in HH (High Frequency) for invisibility: HH basis is [[+, -], [-, +]]
+        quads = B_float.reshape(h // 2, 2, w // 2, 2)
+        quads[:, 0, :, 0] += half
+        quads[:, 0, :, 1] -= half
+        quads[:, 1, :, 0] -= half
+        quads[:, 1, :, 1] += half
+
+        np.clip(B_float, 0, 255, out=B_float)
+        np.copyto(B, B_float, casting='unsafe')
+        return img
 
     def extract_watermark(self, watermarked_path, original_path, output_path):
-        """Extracts robust watermark."""
+        """
+        Extracts robust watermark.
+        original_path may also be a reference saved by save_reference (.npy).
+        """
         img_wm = cv2.imread(watermarked_path)
-        img_orig = cv2.imread(original_path)
-        
-        if img_wm is None or img_orig is None: raise ValueError("Could not load comparison images")
+        if img_wm is None: raise ValueError("Could not load comparison images")
 
-        h, w, _ = img_wm.shape
-        img_orig = img_orig[:h, :w]
-        
+        if original_path.endswith('.npy'):
+            HH_orig = self.load_reference(original_path)
+        else:
+            img_orig = cv2.imread(original_path)
+            if img_orig is None: raise ValueError("Could not load comparison images")
+            h, w, _ = img_wm.shape
+            HH_orig = self.reference_hh(img_orig[:h, :w])
+
+        cv2.imwrite(output_path, self.extract_watermark_array(img_wm, HH_orig))
+
+    def extract_watermark_array(self, img_wm, HH_orig):
+        """In-memory extract_watermark against a precomputed original HH band."""
         (B_wm, _, _) = cv2.split(img_wm)
-        (B_orig, _, _) = cv2.split(img_orig)
-        
         _, (_, _, HH_wm) = pywt.dwt2(np.float32(B_wm), 'haar')
-        _, (_, _, HH_orig) = pywt.dwt2(np.float32(B_orig), 'haar')
         
-        extracted = (HH_wm - HH_orig) / self.alpha
+        h, w = HH_wm.shape
+        if HH_orig.shape[0] < h or HH_orig.shape[1] < w:
+            raise ValueError("Reference is smaller than the watermarked image")
+        
+        extracted = (HH_wm - HH_orig[:h, :w]) / self.alpha
         extracted = np.clip(extracted, 0, 255)
         extracted = np.uint8(extracted)
+        return extracted
+
+    # --- REFERENCE STORE (ONE ORIGINAL, MANY SUSPECTS) ---
+    def reference_hh(self, img_orig):
+        """HH band of the original's B channel (float32), as extraction needs it."""
+        (B_orig, _, _) = cv2.split(img_orig)
+        _, (_, _, HH_orig) = pywt.dwt2(np.float32(B_orig), 'haar')
+        return np.float32(HH_orig)
+
+    def save_reference(self, original_path, reference_path=None):
+        """
+        Computes the original's HH band once and stores it as an .npy file
+        (default: <original_path>.hh.npy). Returns the reference path.
+        """
+        img_orig = cv2.imread(original_path)
+        if img_orig is None: raise ValueError(f"Image not found: {original_path}")
         
-        cv2.imwrite(output_path, extracted)
+        reference_path = reference_path or original_path + ".hh.npy"
+        np.save(reference_path, self.reference_hh(img_orig))
+        self._references.pop(reference_path, None)
+        print(f"[+] Saved watermark reference to {reference_path}")
+        return reference_path
+
+    def load_reference(self, reference_path):
+        """Memory-maps a saved reference; each path is opened once per handler."""
+        HH_orig = self._references.get(reference_path)
+        if HH_orig is None:
+            if not os.path.exists(reference_path): raise ValueError(f"Reference not found: {reference_path}")
+            HH_orig = np.load(reference_path, mmap_mode='r')
+            self._references[reference_path] = HH_orig
+        return HH_orig
+
+    def extract_watermark_batch(self, suspect_paths, reference_path, output_dir, workers=None):
+        """
+        Extracts the watermark of every suspect against one saved reference,
+        on a thread pool. Outputs go to <output_dir>/<suspect name>_wm.png.
+        Returns a list of (suspect_path, output_path or None, error or None).
+        """
+        HH_orig = self.load_reference(reference_path)
+        os.makedirs(output_dir, exist_ok=True)
+        print(f"[*] Extracting watermark from {len(suspect_paths)} suspects...")
+
+        def extract_one(suspect_path):
+            stem = os.path.splitext(os.path.basename(suspect_path))[0]
+            output_path = os.path.join(output_dir, f"{stem}_wm.png")
+            try:
+                img_wm = cv2.imread(suspect_path)
+                if img_wm is None: raise ValueError(f"Image not found: {suspect_path}")
+                cv2.imwrite(output_path, self.extract_watermark_array(img_wm, HH_orig))
+                return suspect_path, output_path, None
+            except Exception as e:
+                return suspect_path, None, str(e)
+
+        with ThreadPoolExecutor(max_workers=workers or self.seal_workers) as pool:
+            return list(pool.map(extract_one, suspect_paths))
 
     # --- FRAGILE LAYER (TAMPER DETECTION) ---
     def embed_fragile_seal(self, image_path, output_path):
@@ -76,83 +219,166 @@ class WatermarkHandler:
         Calculates a Hash of the image and hides it in the Last Row.
         Uses 0xFE mask to avoid integer overflow errors.
         """
-        print("[*] Applying Fragile Tamper-Seal...")
         img = cv2.imread(image_path)
         if img is None: raise ValueError(f"Image not found: {image_path}")
 
+        cv2.imwrite(output_path, self.embed_fragile_seal_array(img))
+        return output_path
+
+    def embed_fragile_seal_array(self, img):
+        """In-memory embed_fragile_seal: seals the BGR ndarray in place and returns it."""
+        print("[*] Applying Fragile Tamper-Seal...")
         h, w, c = img.shape
         
         # 1. Calculate SHA-256 Hash of the image content (excluding last row)
         content_to_hash = img[:-1, :, :].tobytes()
-        img_hash = hashlib.sha256(content_to_hash).hexdigest()
+        img_hash = hashlib.sha256(content_to_hash).digest()
         
-        # 2. Convert Hash to Binary
-        binary_hash = ''.join([format(ord(i), "08b") for i in img_hash])
+        # 2. Convert the raw 32-byte digest to 256 bits
+        bits = np.unpackbits(np.frombuffer(img_hash, dtype=np.uint8))[:w]
         
-        # 3. Embed into LSB of RED Channel in the LAST ROW
-        data_idx = 0
-        data_len = len(binary_hash)
-        
-        for col in range(w):
-            if data_idx >= data_len: break
-            
-            # Get pixel as a standard Python int to avoid overflow warnings
-            pixel_val = int(img[h-1, col, 2]) 
-            bit = int(binary_hash[data_idx])
-            
-            # LSB Modification
-            if bit == 1:
-                pixel_val = pixel_val | 1
-            else:
-                # FIX: Use 0xFE (254) instead of ~1 (-2) to keep it unsigned
-                pixel_val = pixel_val & 0xFE
-                
-            img[h-1, col, 2] = pixel_val
-            data_idx += 1
+        # 3. Embed into LSB of RED Channel in the LAST ROW (0xFE keeps it unsigned)
+        row = img[h-1, :len(bits), 2]
+        row[:] = (row & 0xFE) | bits
             
-        cv2.imwrite(output_path, img)
-        return output_path
+        return img
 
     def verify_fragile_seal(self, image_path):
         """Checks if the image has been tampered with."""
         img = cv2.imread(image_path)
         if img is None: return False, "Could not load image."
         
+        return self.verify_fragile_seal_array(img)
+
+    def verify_fragile_seal_array(self, img):
+        """
+        In-memory verify_fragile_seal for a BGR ndarray.
+        Images sealed before the raw-digest layout (512-bit hex seal) are
+        still accepted when the image is wide enough to hold one.
+        """
         h, w, c = img.shape
         
-        # 1. Extract Hash from Last Row
-        extracted_bits = ""
-        for col in range(w):
-            pixel_val = img[h-1, col, 2] # Red Channel
-            extracted_bits += str(pixel_val & 1)
-            
-            # SHA-256 is 64 hex chars * 8 bits = 512 bits
-            if len(extracted_bits) >= 512: break
-            
-        # Convert bits to string
-        extracted_hash = ""
-        for i in range(0, len(extracted_bits), 8):
-            byte = extracted_bits[i:i+8]
-            try:
-                extracted_hash += chr(int(byte, 2))
-            except:
-                break
+        # 1. Extract Hash from Last Row (SHA-256 digest is 32 bytes = 256 bits)
+        n_bits = min(w, 256)
+        n_bits -= n_bits % 8
+        if n_bits == 0:
+            return False, "❌ NO SEAL: Image is too narrow to hold one, so it cannot be verified."
+        seal_bits = img[h-1, :512, 2] & 1
+        extracted_hash = np.packbits(seal_bits[:n_bits]).tobytes()
             
         # 2. Recalculate Hash of current image content
         content_to_hash = img[:-1, :, :].tobytes()
-        current_hash = hashlib.sha256(content_to_hash).hexdigest()
+        digest = hashlib.sha256(content_to_hash)
+        current_hash = digest.digest()[:len(extracted_hash)]
         
-        print(f"    > Embedded Seal: {extracted_hash[:10]}...")
-        print(f"    > Calculated:    {current_hash[:10]}...")
+        print(f"    > Embedded Seal: {extracted_hash.hex()[:10]}...")
+        print(f"    > Calculated:    {current_hash.hex()[:10]}...")
         
         if extracted_hash == current_hash:
             return True, "✅ INTEGRITY CONFIRMED: Image is authentic."
-        else:
-            return False, "❌ TAMPER DETECTED: Image has been modified!"
+        # Legacy seal: the 64-char hex digest as 512 ASCII bits
+        if w >= 512 and np.packbits(seal_bits).tobytes() == digest.hexdigest().encode('ascii'):
+            return True, "✅ INTEGRITY CONFIRMED: Image is authentic."
+        return False, "❌ TAMPER DETECTED: Image has been modified!"
     
+    # --- TILED FRAGILE LAYER (TAMPER LOCALIZATION) ---
+    def tile_grid(self, h, w):
+        """
+        Splits an (h, w) image into seal tiles.
+        Returns a list of (row, col, y0, y1, x0, x1); edge slivers thinner
+        than 8 px are merged into the neighbouring tile, so a tile is only
+        narrower than 8 px when the whole image is.
+        """
+        def edges(n):
+            cuts = list(range(0, n, max(self.seal_tile, 8))) + [n]
+            if len(cuts) > 2 and cuts[-1] - cuts[-2] < 8: del cuts[-2]
+            return cuts
+        ys, xs = edges(h), edges(w)
+        return [(r, c, ys[r], ys[r + 1], xs[c], xs[c + 1])
+                for r in range(len(ys) - 1) for c in range(len(xs) - 1)]
+
+    @staticmethod
+    def tile_seal_bits(tile):
+        """Number of digest bits stored in a tile's last row: whole bytes, at most 256."""
+        n_bits = min(tile[5] - tile[4], 256)
+        return n_bits - n_bits % 8
+
+    def _tile_digest(self, img, tile):
+        """SHA-256 of one tile, with its reserved LSBs cleared and its position mixed in."""
+        row, col, y0, y1, x0, x1 = tile
+        content = img[y0:y1, x0:x1].copy()
+        content[-1, :self.tile_seal_bits(tile), 2] &= 0xFE  # The seal bits themselves are not hashed
+        digest = hashlib.sha256(struct.pack(">II", row, col))
+        digest.update(content)
+        return digest.digest()
+
+    def hash_tiles(self, img, tiles):
+        """Hashes tiles in parallel; returns the digests in the same order."""
+        with ThreadPoolExecutor(max_workers=self.seal_workers) as pool:
+            return list(pool.map(lambda tile: self._tile_digest(img, tile), tiles))
+
+    def embed_tiled_seal(self, image_path, output_path):
+        """
+        Seals every seal_tile x seal_tile tile independently, so tampering
+        can be localized. Each tile's digest goes into the LSB of the RED
+        channel of that tile's last row.
+        """
+        img = cv2.imread(image_path)
+        if img is None: raise ValueError(f"Image not found: {image_path}")
+
+        cv2.imwrite(output_path, self.embed_tiled_seal_array(img))
+        return output_path
+
+    def embed_tiled_seal_array(self, img):
+        """In-memory embed_tiled_seal: seals the BGR ndarray in place and returns it."""
+        h, w, _ = img.shape
+        if w < 8: raise ValueError("Image too narrow for a tiled seal (needs at least 8 px)")
+        tiles = self.tile_grid(h, w)
+        print(f"[*] Applying Tiled Tamper-Seal ({len(tiles)} tiles)...")
+
+        for tile, digest in zip(tiles, self.hash_tiles(img, tiles)):
+            _, _, y0, y1, x0, x1 = tile
+            bits = np.unpackbits(np.frombuffer(digest, dtype=np.uint8))[:self.tile_seal_bits(tile)]
+            row = img[y1 - 1, x0:x0 + len(bits), 2]
+            row[:] = (row & 0xFE) | bits
+        return img
+
+    def verify_tiled_seal(self, image_path, tiles=None):
+        """Checks a tiled seal; see verify_tiled_seal_array."""
+        img = cv2.imread(image_path)
+        if img is None: return False, "Could not load image.", []
+
+        return self.verify_tiled_seal_array(img, tiles)
+
+    def verify_tiled_seal_array(self, img, tiles=None):
+        """
+        Re-hashes the tiles and compares them with their stored digests.
+        tiles optionally limits the check to a list of (row, col) indices.
+        Returns (is_valid, message, tampered) where tampered lists the
+        (row, col, y0, y1, x0, x1) tiles that no longer match.
+        """
+        h, w, _ = img.shape
+        grid = self.tile_grid(h, w)
+        if tiles is not None:
+            wanted = set(tiles)
+            grid = [tile for tile in grid if (tile[0], tile[1]) in wanted]
+
+        tampered = []
+        for tile, digest in zip(grid, self.hash_tiles(img, grid)):
+            _, _, y0, y1, x0, x1 = tile
+            n_bits = self.tile_seal_bits(tile)
+            stored = np.packbits(img[y1 - 1, x0:x0 + n_bits, 2] & 1).tobytes()
+            # A tile without seal bits cannot be verified, so it never passes
+            if n_bits == 0 or stored != digest[:len(stored)]:
+                tampered.append(tile)
+
+        print(f"    > Tiles checked: {len(grid)}, modified: {len(tampered)}")
+
+        if not tampered:
+            return True, "✅ INTEGRITY CONFIRMED: Image is authentic.", []
+        return False, f"❌ TAMPER DETECTED: {len(tampered)} of {len(grid)} tiles modified!", tampered
+
     def embed_watermark_to_frame(self, frame_img, output_path):
         """Helper to embed watermark directly into a video frame object."""
-        # Save frame temporarily so existing logic can read it
-        cv2.imwrite(output_path, frame_img)
-        # Reuse existing logic
-        return self.embed_watermark(output_path, output_path)
\ No newline at end of file
+        cv2.imwrite(output_path, self.embed_watermark_array(frame_img))
+        return output_path
\ No newline at end of file
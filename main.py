@@ -53,8 +53,8 @@ def main():
     # --- STEP 2: ENCRYPTION & EMBEDDING ---
     print("\n[STEP 2] Encrypting & Hiding Message (Privacy Layer)...")
     try:
-        # A. Adaptive Steganography
-        encrypted_msg = crypto.encrypt(secret_message)
+        # A. Adaptive Steganography (raw IV + ciphertext, no base64)
+        encrypted_msg = crypto.encrypt_bytes(secret_message)
         stego.dct_embed(watermarked_image, encrypted_msg, final_output)
         
         # B. Apply Fragile Seal (NEW)
@@ -42,11 +42,12 @@ def run_comparative_study(cover_image_path, secret_message):
     
     # --- PHASE 1: EMBEDDING ---
     print("\n[1/5] Embedding Data...")
+    # Legacy text layout (no frame header) so BER compares characters 1:1
     print("   > Legacy Sequential Mode...")
-    stego.dct_embed(cover_image_path, secret_message, seq_output, use_adaptive=False)
+    stego.dct_embed(cover_image_path, secret_message, seq_output, use_adaptive=False, legacy=True)
     
     print("   > Proposed Adaptive Mode...")
-    stego.dct_embed(cover_image_path, secret_message, adapt_output, use_adaptive=True)
+    stego.dct_embed(cover_image_path, secret_message, adapt_output, use_adaptive=True, legacy=True)
     
     # --- PHASE 2: VISUAL & STATISTICAL METRICS ---
     print("\n[2/5] Calculating Quality & Security Metrics...")
@@ -74,7 +75,7 @@ def run_comparative_study(cover_image_path, secret_message):
     
     # Recover from Sequential
     try:
-        rec_seq = stego.dct_extract(attacked_seq_path, use_adaptive=False)
+        rec_seq = stego.dct_extract(attacked_seq_path, use_adaptive=False, legacy=True)
         score_seq = calculate_recovery_rate(secret_message, rec_seq)
     except Exception as e:
         rec_seq = "Extraction Error"
@@ -82,7 +83,7 @@ def run_comparative_study(cover_image_path, secret_message):
 
     # Recover from Adaptive
     try:
-        rec_adapt = stego.dct_extract(attacked_adapt_path, use_adaptive=True)
+        rec_adapt = stego.dct_extract(attacked_adapt_path, use_adaptive=True, legacy=True)
         score_adapt = calculate_recovery_rate(secret_message, rec_adapt)
     except Exception as e:
         rec_adapt = "Extraction Error"